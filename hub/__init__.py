@@ -0,0 +1,4 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+shared hub utilities used by runners around the model packages
+'''
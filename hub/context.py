@@ -0,0 +1,28 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+the ctx object hub runners hand to Model.train/infer
+'''
+
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+
+class ModelContext:
+    '''
+    ctx handed to train/infer: df, the model.yaml parameters (exposed as both
+    params and hyperparameters, the two names models read them under), a
+    logger and an optional cancel_event set when the caller gives up
+    '''
+    def __init__(
+        self,
+        df=None,
+        params: Dict[str, Any] = None,
+        cancel_event: Optional[threading.Event] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        self.df = df
+        self.params = params or {}
+        self.hyperparameters = self.params
+        self.logger = logger or logging.getLogger(__name__)
+        self.cancel_event = cancel_event
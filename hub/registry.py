@@ -0,0 +1,369 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+compiled model registry
+every models/*/model.yaml is compiled into one indexed registry (by name, slug,
+runtime, tag and version). the compiled form is cached on disk and invalidated
+by file mtimes, so a cold start only stats the model directories. MODEL.py files
+are validated with ast, never imported, so heavy frameworks are not loaded.
+this module also generates registry/models.json from the yaml files:
+
+    python -m hub.registry            # regenerate registry/models.json
+    python -m hub.registry --check    # validate packages, fail on problems
+'''
+
+import argparse
+import ast
+import datetime
+import functools
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+import time
+import types
+from typing import Any, Dict, List, Optional, Set
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(REPO_ROOT, "models")
+REGISTRY_PATHS = (
+    os.path.join(REPO_ROOT, "registry", "models.json"),
+    os.path.join(REPO_ROOT, "public", "registry", "models.json"),
+)
+REGISTRY_VERSION = "1.0.0"
+_CACHE_FORMAT = 1
+
+
+def validate_model_file(path: str) -> Dict[str, Any]:
+    '''
+    statically inspect MODEL.py: v2 needs class Model with train and infer,
+    v1 needs a module-level execute (or Model.execute)
+    '''
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    functions: Set[str] = set()
+    methods: Set[str] = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.add(node.name)
+        elif isinstance(node, ast.ClassDef) and node.name == "Model":
+            methods = {
+                n.name for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))
+            }
+
+    interfaces = []
+    if {"train", "infer"} <= methods:
+        interfaces.append("v2")
+    if "execute" in functions or "execute" in methods:
+        interfaces.append("v1")
+    problems = [] if interfaces else ["MODEL.py exposes neither Model.train/infer nor execute"]
+    return {"interfaces": interfaces, "problems": problems}
+
+
+def compile_package(model_dir: str) -> Dict[str, Any]:
+    '''
+    compile one package directory into a registry entry
+    '''
+    with open(os.path.join(model_dir, "model.yaml"), encoding="utf-8") as f:
+        spec = yaml.safe_load(f) or {}
+
+    name = spec.get("name") or os.path.basename(model_dir)
+    problems = []
+    for field in ("name", "version", "runtime", "description"):
+        if not spec.get(field):
+            problems.append(f"model.yaml missing '{field}'")
+
+    parameters = []
+    for param_name, param in (spec.get("parameters") or {}).items():
+        entry = {
+            "name": param_name,
+            "type": param.get("type"),
+            "default": param.get("default"),
+            "description": param.get("description", "")
+        }
+        if param.get("enum"):
+            entry["enum"] = list(param["enum"])
+        parameters.append(entry)
+
+    model_file = os.path.join(model_dir, "MODEL.py")
+    if os.path.exists(model_file):
+        validation = validate_model_file(model_file)
+    else:
+        validation = {"interfaces": [], "problems": ["MODEL.py not found"]}
+
+    return {
+        "name": name,
+        "slug": spec.get("slug") or name.replace("_", "-"),
+        "version": str(spec.get("version", "")),
+        "runtime": spec.get("runtime", ""),
+        "framework": spec.get("framework", ""),
+        "description": spec.get("description", ""),
+        "author": spec.get("author", ""),
+        "license": spec.get("license", ""),
+        "tags": list(spec.get("tags") or []),
+        "parameters": parameters,
+        "path": os.path.relpath(model_dir, REPO_ROOT).replace(os.sep, "/"),
+        "interfaces": validation["interfaces"],
+        "problems": problems + validation["problems"],
+    }
+
+
+def _package_dirs(models_dir: str) -> List[str]:
+    with os.scandir(models_dir) as entries:
+        return sorted(
+            e.path for e in entries
+            if e.is_dir() and os.path.exists(os.path.join(e.path, "model.yaml"))
+        )
+
+
+def _fingerprint(model_dir: str) -> List[int]:
+    stamps = []
+    for file_name in ("model.yaml", "MODEL.py"):
+        try:
+            stamps.append(os.stat(os.path.join(model_dir, file_name)).st_mtime_ns)
+        except FileNotFoundError:
+            stamps.append(0)
+    return stamps
+
+
+class Registry:
+    '''
+    indexed, cached view of every model package under models_dir
+
+    lookups are plain dict reads; the file system is re-checked at most every
+    check_interval seconds and only packages whose mtimes changed are recompiled
+    '''
+
+    def __init__(
+        self,
+        models_dir: str = MODELS_DIR,
+        cache_path: Optional[str] = None,
+        check_interval: float = 1.0
+    ):
+        self.models_dir = models_dir
+        self.cache_path = cache_path
+        self.check_interval = check_interval
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._fingerprints: Dict[str, List[int]] = {}
+        self._checked = 0.0
+        self._load_cache()
+        self.refresh(force=True)
+
+    # lookups
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        self.refresh()
+        return self._by_name.get(name)
+
+    def by_slug(self, slug: str) -> Optional[Dict[str, Any]]:
+        self.refresh()
+        return self._by_slug.get(slug)
+
+    def find(
+        self,
+        runtime: Optional[str] = None,
+        tag: Optional[str] = None,
+        version: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        '''
+        entries matching every given filter, in name order
+        '''
+        self.refresh()
+        names: Optional[Set[str]] = None
+        for index, key in ((self._by_runtime, runtime), (self._by_tag, tag), (self._by_version, version)):
+            if key is None:
+                continue
+            matched = index.get(key, set())
+            names = set(matched) if names is None else names & matched
+        if names is None:
+            names = set(self._by_name)
+        return [self._by_name[n] for n in sorted(names)]
+
+    def all(self) -> List[Dict[str, Any]]:
+        self.refresh()
+        return [self._by_name[n] for n in sorted(self._by_name)]
+
+    def problems(self) -> Dict[str, List[str]]:
+        self.refresh()
+        return {e["name"]: e["problems"] for e in self._by_name.values() if e["problems"]}
+
+    def model_dir(self, name: str) -> str:
+        entry = self.get(name)
+        if entry is None:
+            raise KeyError(f"unknown model: {name}")
+        return os.path.join(REPO_ROOT, entry["path"])
+
+    # compilation
+
+    def refresh(self, force: bool = False) -> bool:
+        '''
+        recompile packages whose model.yaml or MODEL.py changed
+        returns True when the registry changed
+        '''
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return False
+        self._checked = now
+
+        dirs = _package_dirs(self.models_dir)
+        changed = set(self._entries) - set(dirs)
+        for model_dir in changed:
+            self._entries.pop(model_dir, None)
+            self._fingerprints.pop(model_dir, None)
+        for model_dir in dirs:
+            stamp = _fingerprint(model_dir)
+            if self._fingerprints.get(model_dir) != stamp:
+                self._entries[model_dir] = compile_package(model_dir)
+                self._fingerprints[model_dir] = stamp
+                changed.add(model_dir)
+
+        if changed or force:
+            self._build_indexes()
+        if changed:
+            self._save_cache()
+        return bool(changed)
+
+    def _build_indexes(self) -> None:
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._by_slug: Dict[str, Dict[str, Any]] = {}
+        self._by_runtime: Dict[str, Set[str]] = {}
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._by_version: Dict[str, Set[str]] = {}
+        for entry in self._entries.values():
+            name = entry["name"]
+            if name in self._by_name:
+                logger.warning(f"duplicate model name '{name}' in {entry['path']}")
+            self._by_name[name] = entry
+            self._by_slug[entry["slug"]] = entry
+            self._by_runtime.setdefault(entry["runtime"], set()).add(name)
+            self._by_version.setdefault(entry["version"], set()).add(name)
+            for tag in entry["tags"]:
+                self._by_tag.setdefault(tag, set()).add(name)
+
+    def _load_cache(self) -> None:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"ignoring unreadable registry cache {self.cache_path}: {e}")
+            return
+        if cache.get("format") != _CACHE_FORMAT or cache.get("models_dir") != os.path.abspath(self.models_dir):
+            return
+        for model_dir, item in cache.get("packages", {}).items():
+            self._entries[model_dir] = item["entry"]
+            self._fingerprints[model_dir] = item["fingerprint"]
+
+    def _save_cache(self) -> None:
+        if not self.cache_path:
+            return
+        cache = {
+            "format": _CACHE_FORMAT,
+            "models_dir": os.path.abspath(self.models_dir),
+            "packages": {
+                d: {"entry": self._entries[d], "fingerprint": self._fingerprints[d]} for d in self._entries
+            },
+        }
+        tmp = f"{self.cache_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp, self.cache_path)
+
+    # registry/models.json
+
+    def to_json(self, updated: Optional[str] = None) -> str:
+        '''
+        registry/models.json document (validation fields are not published)
+        '''
+        models = [
+            {k: v for k, v in entry.items() if k not in ("interfaces", "problems")}
+            for entry in self.all()
+        ]
+        document = {
+            "version": REGISTRY_VERSION,
+            "updated": updated or datetime.date.today().isoformat(),
+            "models": models,
+        }
+        return _dump_json(document) + "\n"
+
+    def write_json(self, paths=REGISTRY_PATHS, updated: Optional[str] = None) -> None:
+        text = self.to_json(updated)
+        for path in paths:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            logger.info(f"wrote {path}")
+
+
+def _dump_json(value: Any, indent: int = 0) -> str:
+    '''
+    json.dumps(indent=2), but lists of scalars stay on one line as in the
+    hand-written registry
+    '''
+    pad = "  " * indent
+    if isinstance(value, dict):
+        if not value:
+            return "{}"
+        items = [f'{pad}  {json.dumps(k)}: {_dump_json(v, indent + 1)}' for k, v in value.items()]
+        return "{\n" + ",\n".join(items) + f"\n{pad}}}"
+    if isinstance(value, list):
+        if all(not isinstance(v, (dict, list)) for v in value):
+            return "[" + ", ".join(json.dumps(v) for v in value) + "]"
+        items = [f"{pad}  {_dump_json(v, indent + 1)}" for v in value]
+        return "[\n" + ",\n".join(items) + f"\n{pad}]"
+    return json.dumps(value)
+
+
+@functools.lru_cache(maxsize=None)
+def load_model_module(model_dir: str):
+    '''
+    import <model_dir>/MODEL.py, inside a package when the directory has an
+    __init__.py so relative imports inside the model keep working
+    '''
+    model_dir = os.path.abspath(model_dir)
+    name = os.path.basename(model_dir)
+    if os.path.exists(os.path.join(model_dir, "__init__.py")):
+        if name not in sys.modules:
+            # bare package shell: relative imports resolve without running __init__
+            package = types.ModuleType(name)
+            package.__path__ = [model_dir]
+            sys.modules[name] = package
+        return importlib.import_module(f"{name}.MODEL")
+    spec = importlib.util.spec_from_file_location(f"{name}_MODEL", os.path.join(model_dir, "MODEL.py"))
+    module = importlib.util.module_from_spec(spec)
+    # registered so trained instances can be pickled and restored by name
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_model_class(model_dir: str):
+    return load_model_module(model_dir).Model
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="compile model.yaml files into the model registry")
+    parser.add_argument("--check", action="store_true", help="validate packages without writing json")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    registry = Registry(args.models_dir)
+    problems = registry.problems()
+    for name, issues in sorted(problems.items()):
+        for issue in issues:
+            logger.error(f"{name}: {issue}")
+    if args.check:
+        return 1 if problems else 0
+    registry.write_json()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+async execution wrapper for hub models
+AsyncModel wraps any model package (v2 Model.train/infer, model_1 style
+infer(ctx, loaded_model=None), or v1 execute) and runs its calls off the event
+loop in a bounded thread or process executor, with per-model concurrency
+limits and timeouts (a timed-out call stops being awaited but is not killed,
+see AsyncModel). AsyncHub serves every registered model from one event loop:
+
+    hub = AsyncHub()
+    result = await hub.infer("model_sklearn", df, timeout=30)
+'''
+
+import asyncio
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .context import ModelContext
+from .registry import Registry, load_model_module
+
+logger = logging.getLogger(__name__)
+
+# pure-python runtimes hold the GIL, so they get their own processes;
+# numpy/framework runtimes release it and run fine on threads
+DEFAULT_EXECUTORS = {
+    "networkx": "process",
+}
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# process workers keep one model instance per package, reloaded when the
+# parent publishes a newer trained state
+_WORKER_MODELS: Dict[str, Any] = {}
+
+
+def _worker_model(model_dir: str, state_path: Optional[str], state_version: int):
+    cached = _WORKER_MODELS.get(model_dir)
+    if cached is not None and cached[0] == state_version:
+        return cached[1]
+    module = load_model_module(model_dir)
+    if state_path is not None:
+        # the module must be imported before its instances can be unpickled
+        with open(state_path, "rb") as f:
+            model = pickle.load(f)
+    else:
+        model = module.Model()
+    _WORKER_MODELS[model_dir] = (state_version, model)
+    return model
+
+
+def _process_call(model_dir: str, method: str, ctx: Any, state_path: Optional[str], state_version: int, state_out: Optional[str]):
+    '''
+    run one call inside a process worker; train fits a fresh instance and
+    pickles it to state_out so the parent can hand it to the other workers.
+    the worker's cached instance is never trained in place, so a failed train
+    leaves the published state untouched
+    '''
+    module = load_model_module(model_dir)
+    if method == "execute" and hasattr(module, "execute"):
+        return module.execute(ctx)
+    if method == "train":
+        model = module.Model()
+        result = model.train(ctx)
+        with open(state_out, "wb") as f:
+            pickle.dump(model, f)
+        return result
+    model = _worker_model(model_dir, state_path, state_version)
+    if method == "execute":
+        return model.execute(ctx)
+    return getattr(model, method)(ctx)
+
+
+class AsyncModel:
+    '''
+    async adapter around one model package
+
+    executor is "thread" or "process" (default picked from the runtime);
+    max_concurrency bounds in-flight calls for this model.
+
+    cancellation is advisory only: a timeout or cancel stops the caller
+    waiting, but the call runs to completion in its worker and keeps its slot
+    until it returns. in thread mode ctx.cancel_event is set so a model can
+    stop early by checking it; none of the bundled models do, and process
+    mode has no cancel signal at all.
+
+    the package is only imported inside the executor. train always works on a
+    fresh instance in either mode, and the trained state is published only when it succeeds, so concurrent infers keep
+    using the previous state instead of racing the train
+    '''
+
+    def __init__(
+        self,
+        model_dir: str,
+        runtime: Optional[str] = None,
+        executor: Optional[str] = None,
+        max_concurrency: int = 4,
+        timeout: Optional[float] = None
+    ):
+        self.model_dir = os.path.abspath(model_dir)
+        self.runtime = runtime
+        self.executor_kind = executor or DEFAULT_EXECUTORS.get(runtime, "thread")
+        if self.executor_kind not in ("thread", "process"):
+            raise ValueError(f"unknown executor: {self.executor_kind}")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._model = None
+        # guards module loading and the shared instance across executor threads
+        self._lock = threading.Lock()
+        self._state_version = 0
+        self._state_path: Optional[str] = None
+        # in-flight process calls per state file; a superseded file is removed
+        # once no queued or running call still needs to load it
+        self._state_refs: Dict[str, int] = {}
+
+    async def train(self, df=None, params: Optional[Dict[str, Any]] = None, ctx: Any = None,
+                    timeout: Optional[float] = None) -> Any:
+        return await self._submit("train", ctx, df, params, timeout)
+
+    async def infer(self, df=None, params: Optional[Dict[str, Any]] = None, ctx: Any = None,
+                    timeout: Optional[float] = None) -> Any:
+        return await self._submit("infer", ctx, df, params, timeout)
+
+    async def execute(self, data: Any = None, timeout: Optional[float] = None) -> Any:
+        '''
+        v1 call: module-level execute(input_data) when the package exports it,
+        otherwise the Model.execute shim
+        '''
+        return await self._run("execute", data, None, timeout)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._state_path is not None:
+            path, self._state_path = self._state_path, None
+            if not self._state_refs.get(path):
+                _remove(path)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _thread_call(self, method: str, ctx: Any) -> Tuple[Any, Any]:
+        '''
+        run one call on an executor thread; returns (result, trained instance)
+        '''
+        with self._lock:
+            module = load_model_module(self.model_dir)
+        if method == "execute" and hasattr(module, "execute"):
+            return module.execute(ctx), None
+        if method == "train":
+            model = module.Model()
+            return model.train(ctx), model
+        with self._lock:
+            if self._model is None:
+                self._model = module.Model()
+            model = self._model
+        return getattr(model, method)(ctx), None
+
+    async def _submit(self, method: str, ctx: Any, df: Any, params: Optional[Dict[str, Any]],
+                      timeout: Optional[float]) -> Any:
+        cancel_event = threading.Event() if self.executor_kind == "thread" else None
+        if ctx is None:
+            ctx = ModelContext(df, params, cancel_event, logger)
+        elif cancel_event is not None and not hasattr(ctx, "cancel_event"):
+            ctx.cancel_event = cancel_event
+        return await self._run(method, ctx, getattr(ctx, "cancel_event", None), timeout)
+
+    def _prepare(self, method: str, ctx: Any) -> Tuple[Callable[..., Any], tuple, Optional[str]]:
+        '''
+        function and arguments to run in the executor, plus the file a process
+        train call will write the trained instance to
+        '''
+        if self.executor_kind == "thread":
+            return self._thread_call, (method, ctx), None
+
+        state_out = None
+        if method == "train":
+            fd, state_out = tempfile.mkstemp(prefix="openuba-model-", suffix=".pkl")
+            os.close(fd)
+        return _process_call, (self.model_dir, method, ctx, self._state_path, self._state_version, state_out), state_out
+
+    def _acquire_state(self) -> Optional[str]:
+        path = self._state_path
+        if path is not None:
+            self._state_refs[path] = self._state_refs.get(path, 0) + 1
+        return path
+
+    def _release_state(self, path: Optional[str]) -> None:
+        if path is None:
+            return
+        self._state_refs[path] -= 1
+        if not self._state_refs[path]:
+            del self._state_refs[path]
+            if path != self._state_path:
+                _remove(path)
+
+    def _ensure_started(self) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(self.max_concurrency)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self.max_concurrency, thread_name_prefix=os.path.basename(self.model_dir)
+                )
+
+    async def _run(self, method: str, ctx: Any, cancel_event: Optional[threading.Event],
+                   timeout: Optional[float]) -> Any:
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        await self._semaphore.acquire()
+        state_in = self._acquire_state() if self.executor_kind == "process" else None
+        try:
+            fn, args, state_out = self._prepare(method, ctx)
+            future = loop.run_in_executor(self._executor, fn, *args)
+        except BaseException:
+            self._release_state(state_in)
+            self._semaphore.release()
+            raise
+        future.add_done_callback(self._finished)
+        # the state file this call loads stays on disk until the call returns
+        future.add_done_callback(lambda _: self._release_state(state_in))
+
+        limit = timeout if timeout is not None else self.timeout
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), limit)
+        except BaseException:
+            # a running worker can't be interrupted: signal it and let its
+            # slot free up when it returns
+            if cancel_event is not None:
+                cancel_event.set()
+            if state_out is not None:
+                future.add_done_callback(lambda _: _remove(state_out))
+            raise
+
+        if self.executor_kind == "thread":
+            result, trained = result
+            if trained is not None:
+                with self._lock:
+                    self._model = trained
+        if state_out is not None:
+            self._publish_state(state_out)
+        return result
+
+    def _finished(self, future: asyncio.Future) -> None:
+        self._semaphore.release()
+        # abandoned calls (timeout/cancel) would otherwise log "never retrieved"
+        if not future.cancelled():
+            future.exception()
+
+    def _publish_state(self, state_out: str) -> None:
+        previous = self._state_path
+        self._state_path = state_out
+        self._state_version += 1
+        if previous is not None and not self._state_refs.get(previous):
+            _remove(previous)
+
+
+class AsyncHub:
+    '''
+    one AsyncModel per registered model, created on first use
+    '''
+
+    def __init__(self, registry: Optional[Registry] = None, max_concurrency: int = 4,
+                 timeout: Optional[float] = None, executors: Optional[Dict[str, str]] = None):
+        self.registry = registry or Registry()
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.executors = dict(DEFAULT_EXECUTORS, **(executors or {}))
+        self._models: Dict[str, AsyncModel] = {}
+
+    def model(self, name: str) -> AsyncModel:
+        if name not in self._models:
+            entry = self.registry.get(name)
+            if entry is None:
+                raise KeyError(f"unknown model: {name}")
+            runtime = entry["runtime"]
+            self._models[name] = AsyncModel(
+                self.registry.model_dir(name),
+                runtime=runtime,
+                executor=self.executors.get(runtime, "thread"),
+                max_concurrency=self.max_concurrency,
+                timeout=self.timeout
+            )
+        return self._models[name]
+
+    async def train(self, name: str, df=None, params: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        return await self.model(name).train(df, params, **kwargs)
+
+    async def infer(self, name: str, df=None, params: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        return await self.model(name).infer(df, params, **kwargs)
+
+    async def execute(self, name: str, data: Any = None, **kwargs) -> Any:
+        return await self.model(name).execute(data, **kwargs)
+
+    def close(self) -> None:
+        for model in self._models.values():
+            model.close()
+        self._models.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,307 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+batched result sinks for streaming model output to storage
+sinks consume result dataframes chunk by chunk so scoring output can be
+persisted with bounded memory instead of materializing one large frame
+'''
+
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class ResultSink:
+    '''
+    base sink: write() dataframe chunks, close() when done
+    usable as a context manager so partial output is flushed on error
+    '''
+
+    def write(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def drain(chunks: Iterable[pd.DataFrame], *sinks: ResultSink) -> int:
+    '''
+    push every chunk from an iterable of result frames into the given sinks
+    returns the number of rows written; every sink is closed on exit, even
+    when an earlier one fails to close, and the first close error is re-raised
+    '''
+    rows = 0
+    try:
+        for chunk in chunks:
+            if chunk is None or len(chunk) == 0:
+                continue
+            for sink in sinks:
+                sink.write(chunk)
+            rows += len(chunk)
+    finally:
+        first_error = None
+        for sink in sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                logger.error(f"closing {type(sink).__name__} failed: {e}")
+                if first_error is None:
+                    first_error = e
+        if first_error is not None:
+            raise first_error
+    return rows
+
+
+class ParquetSink(ResultSink):
+    '''
+    append-only parquet writer
+    chunks are buffered until row_group_size rows are pending, then written as
+    one row group, so memory stays bounded by a single row group
+    nested columns (e.g. details dicts) are stored as json strings and
+    categorical columns as plain values, to keep the schema stable across chunks
+    '''
+
+    def __init__(
+        self,
+        path: str,
+        row_group_size: int = 100_000,
+        compression: str = "snappy",
+        json_columns: Sequence[str] = ("details",)
+    ):
+        if row_group_size <= 0:
+            raise ValueError("row_group_size must be positive")
+        self.path = path
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.json_columns = tuple(json_columns)
+        self.rows_written = 0
+        self._pending: List[pd.DataFrame] = []
+        self._pending_rows = 0
+        self._writer = None
+        self._schema = None
+        self._closed = False
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self._closed:
+            raise ValueError("write to closed ParquetSink")
+        if df is None or len(df) == 0:
+            return
+        self._pending.append(self._prepare(df))
+        self._pending_rows += len(df)
+        while self._pending_rows >= self.row_group_size:
+            self._write_row_group(self.row_group_size)
+
+    def flush(self) -> None:
+        if self._pending_rows:
+            self._write_row_group(self._pending_rows)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._closed = True
+        logger.info(f"parquet sink closed: {self.rows_written} rows -> {self.path}")
+
+    def _prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        cols = [c for c in self.json_columns if c in df.columns]
+        # a categorical would lock the column to the first chunk's dictionary
+        # index width, and chunks with different categories don't concatenate
+        categoricals = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+        if not cols and not categoricals:
+            return df
+        df = df.copy()
+        for col in categoricals:
+            df[col] = df[col].astype(object)
+        for col in cols:
+            df[col] = df[col].map(lambda v: None if v is None else json.dumps(v, default=str))
+        return df
+
+    def _write_row_group(self, n: int) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        frame = pd.concat(self._pending, ignore_index=True) if len(self._pending) > 1 else self._pending[0]
+        head, rest = frame.iloc[:n], frame.iloc[n:]
+        self._pending = [rest] if len(rest) else []
+        self._pending_rows = len(rest)
+
+        table = pa.Table.from_pandas(head, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression=self.compression)
+        self._writer.write_table(table, row_group_size=n)
+        self.rows_written += n
+
+
+class ElasticsearchBulkSink(ResultSink):
+    '''
+    elasticsearch _bulk writer
+    rows are serialized to ndjson and grouped into batches of batch_size docs;
+    `concurrency` worker threads send batches in parallel and at most
+    max_pending batches are queued, so write() blocks (backpressure) when
+    elasticsearch falls behind instead of growing memory
+    '''
+
+    def __init__(
+        self,
+        host: str,
+        index: str,
+        batch_size: int = 500,
+        concurrency: int = 2,
+        max_pending: Optional[int] = None,
+        id_column: Optional[str] = None,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        if batch_size <= 0 or concurrency <= 0:
+            raise ValueError("batch_size and concurrency must be positive")
+        self.url = host.rstrip("/") + "/_bulk"
+        self.index = index
+        self.batch_size = batch_size
+        self.id_column = id_column
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.headers = {"Content-Type": "application/x-ndjson"}
+        self.headers.update(headers or {})
+
+        self.docs_sent = 0
+        # per-document failures reported by elasticsearch
+        self.errors: List[Dict[str, Any]] = []
+        # whole _bulk requests that failed after retries
+        self.failed_requests: List[str] = []
+        self._buffer: List[str] = []
+        self._buffered_docs = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=max_pending or concurrency * 2)
+        self._closed = False
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"es-bulk-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self._closed:
+            raise ValueError("write to closed ElasticsearchBulkSink")
+        if df is None or len(df) == 0:
+            return
+        start = 0
+        while start < len(df):
+            take = self.batch_size - self._buffered_docs
+            chunk = df.iloc[start:start + take]
+            self._buffer.extend(self._to_bulk_lines(chunk))
+            self._buffered_docs += len(chunk)
+            start += take
+            if self._buffered_docs >= self.batch_size:
+                self._enqueue()
+
+    def flush(self) -> None:
+        if self._buffered_docs:
+            self._enqueue()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._closed = True
+        logger.info(
+            f"elasticsearch sink closed: {self.docs_sent} docs, {len(self.errors)} failed docs,"
+            f" {len(self.failed_requests)} failed requests"
+        )
+        if self.failed_requests:
+            raise RuntimeError(
+                f"{len(self.failed_requests)} bulk requests failed, first: {self.failed_requests[0]}"
+            )
+        if self.errors:
+            raise RuntimeError(f"{len(self.errors)} bulk items failed, first: {self.errors[0]}")
+
+    def _to_bulk_lines(self, df: pd.DataFrame) -> List[str]:
+        docs = df.to_json(orient="records", lines=True, date_format="iso").split("\n")
+        if self.id_column is not None and self.id_column in df.columns:
+            actions = [
+                json.dumps({"index": {"_index": self.index, "_id": str(v)}})
+                for v in df[self.id_column].tolist()
+            ]
+        else:
+            actions = [json.dumps({"index": {"_index": self.index}})] * len(df)
+        lines = []
+        for action, doc in zip(actions, docs):
+            lines.append(action)
+            lines.append(doc)
+        return lines
+
+    def _enqueue(self) -> None:
+        body = ("\n".join(self._buffer) + "\n").encode("utf-8")
+        self._buffer = []
+        self._buffered_docs = 0
+        # blocks when max_pending batches are in flight
+        self._queue.put(body)
+
+    def _worker(self) -> None:
+        while True:
+            body = self._queue.get()
+            try:
+                if body is None:
+                    return
+                self._send(body)
+            except Exception as e:
+                logger.error(f"bulk request failed: {e}")
+                with self._lock:
+                    self.failed_requests.append(str(e))
+            finally:
+                self._queue.task_done()
+
+    def _send(self, body: bytes) -> None:
+        for attempt in range(self.max_retries + 1):
+            request = urllib.request.Request(self.url, data=body, headers=self.headers, method="POST")
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    result = json.loads(response.read() or b"{}")
+                break
+            except urllib.error.HTTPError as e:
+                # 429 and 5xx are transient on a busy cluster
+                if (e.code == 429 or e.code >= 500) and attempt < self.max_retries:
+                    time.sleep(0.5 * 2 ** attempt)
+                    continue
+                raise
+            except urllib.error.URLError:
+                if attempt < self.max_retries:
+                    time.sleep(0.5 * 2 ** attempt)
+                    continue
+                raise
+
+        items = result.get("items", [])
+        failed = [
+            item for item in items
+            if next(iter(item.values()), {}).get("status", 200) >= 300
+        ] if result.get("errors") else []
+        with self._lock:
+            self.docs_sent += len(items) - len(failed)
+            self.errors.extend(failed)
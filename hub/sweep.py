@@ -0,0 +1,297 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+parallel hyperparameter sweep driven by model.yaml parameter specs
+candidates are generated from the declared parameter schema (grid, random or
+successive halving), each one runs train + infer in a process pool that shares
+one read-only copy of the dataset, and is scored against a labeled validation set
+'''
+
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from .context import ModelContext
+from .registry import load_model_class
+
+logger = logging.getLogger(__name__)
+
+# parameters that only control reproducibility are never searched by default
+_FIXED_PARAMETERS = {"random_state", "seed"}
+
+# dataset shared with workers; inherited copy-on-write under fork
+_SHARED: Dict[str, Any] = {}
+
+Space = Dict[str, Union[Sequence[Any], Tuple[float, float]]]
+
+
+def load_parameter_schema(model_dir: str) -> Dict[str, Dict[str, Any]]:
+    '''
+    read the typed parameter specs declared in <model_dir>/model.yaml
+    '''
+    with open(os.path.join(model_dir, "model.yaml")) as f:
+        spec = yaml.safe_load(f) or {}
+    return spec.get("parameters") or {}
+
+
+def default_space(schema: Dict[str, Dict[str, Any]]) -> Space:
+    '''
+    derive a search space from the schema: enums and booleans take every value,
+    numeric parameters span a quarter to four times their default.
+    integer ranges are (low, high) tuples, sampled log-uniformly.
+    parameters marked `tunable: false` (config switches such as a data source
+    or detection mode) keep their default
+    '''
+    space: Space = {}
+    for name, spec in schema.items():
+        if name in _FIXED_PARAMETERS or spec.get("tunable") is False:
+            continue
+        kind = spec.get("type")
+        default = spec.get("default")
+        if spec.get("enum"):
+            space[name] = list(spec["enum"])
+        elif kind == "boolean":
+            space[name] = [True, False]
+        elif kind == "integer" and isinstance(default, int) and default > 0:
+            space[name] = (max(1, default // 4), default * 4)
+        elif kind == "float" and isinstance(default, (int, float)) and default > 0:
+            high = default * 4
+            if default < 1:
+                # fractions (contamination, dropout, ...) must stay below 1
+                high = min(high, (1 + default) / 2)
+            space[name] = (default / 4, high)
+    return space
+
+
+def _is_range(values: Any) -> bool:
+    return isinstance(values, tuple) and len(values) == 2 and all(isinstance(v, (int, float)) for v in values)
+
+
+def _range_points(low: float, high: float, n: int, integer: bool) -> List[Any]:
+    points = np.geomspace(low, high, n) if low > 0 else np.linspace(low, high, n)
+    if integer:
+        return sorted({int(round(p)) for p in points})
+    return [float(p) for p in points]
+
+
+def grid_candidates(space: Space, schema: Dict[str, Dict[str, Any]], points: int = 3) -> List[Dict[str, Any]]:
+    '''
+    cartesian product of the space; ranges are expanded to `points` values
+    '''
+    axes = {}
+    for name, values in space.items():
+        if _is_range(values):
+            integer = schema.get(name, {}).get("type") == "integer"
+            axes[name] = _range_points(values[0], values[1], points, integer)
+        else:
+            axes[name] = list(values)
+    names = list(axes)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(axes[n] for n in names))]
+
+
+def random_candidates(
+    space: Space,
+    schema: Dict[str, Dict[str, Any]],
+    n: int,
+    seed: int = 0
+) -> List[Dict[str, Any]]:
+    '''
+    n independent samples; positive ranges are sampled log-uniformly
+    '''
+    rng = np.random.default_rng(seed)
+    candidates = []
+    for _ in range(n):
+        candidate = {}
+        for name, values in space.items():
+            if _is_range(values):
+                low, high = values
+                value = math.exp(rng.uniform(math.log(low), math.log(high))) if low > 0 else rng.uniform(low, high)
+                if schema.get(name, {}).get("type") == "integer":
+                    value = int(round(value))
+                candidate[name] = value
+            else:
+                candidate[name] = values[rng.integers(len(values))]
+        candidates.append(candidate)
+    return candidates
+
+
+def roc_auc(y: np.ndarray, scores: np.ndarray) -> float:
+    '''
+    rank-based roc auc (mann-whitney u), ties get average ranks
+    '''
+    positives = int(np.sum(y == 1))
+    negatives = len(y) - positives
+    if positives == 0 or negatives == 0:
+        return float("nan")
+    ranks = pd.Series(scores).rank(method="average").values
+    return float((ranks[y == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def average_precision(y: np.ndarray, scores: np.ndarray) -> float:
+    positives = int(np.sum(y == 1))
+    if positives == 0:
+        return float("nan")
+    order = np.argsort(-scores, kind="mergesort")
+    hits = (y[order] == 1).astype(np.float64)
+    precision = np.cumsum(hits) / np.arange(1, len(hits) + 1)
+    return float(np.sum(precision * hits) / positives)
+
+
+METRICS = {"roc_auc": roc_auc, "average_precision": average_precision}
+
+
+def _init_worker(shared: Optional[Dict[str, Any]]) -> None:
+    # under fork the parent's _SHARED is already inherited and shared is None
+    if shared is not None:
+        _SHARED.update(shared)
+
+
+def _evaluate(candidate: Dict[str, Any], fraction: float, seed: int) -> Dict[str, Any]:
+    '''
+    worker: train on (a fraction of) the shared training set, infer on the
+    validation set and score the result against its labels
+    '''
+    model_dir = _SHARED["model_dir"]
+    defaults = _SHARED["defaults"]
+    id_column = _SHARED["id_column"]
+    label_column = _SHARED["label_column"]
+    train_df = _SHARED["train"]
+    valid_df = _SHARED["valid"]
+
+    params = dict(defaults)
+    params.update(candidate)
+    result = {"params": candidate, "fraction": fraction, "score": float("nan"), "error": None}
+    started = time.perf_counter()
+    try:
+        if fraction < 1.0 and train_df is not None:
+            train_df = train_df.sample(frac=fraction, random_state=seed)
+
+        model = load_model_class(os.path.abspath(model_dir))()
+        model.train(ModelContext(train_df, params, logger=logger))
+        output = model.infer(ModelContext(valid_df.drop(columns=[label_column]), params, logger=logger))
+
+        if id_column in valid_df.columns:
+            scores = output.groupby(output["entity_id"].astype(str))["risk_score"].max()
+            labels = valid_df.groupby(valid_df[id_column].astype(str))[label_column].max()
+            # entities the model did not report count as scored 0
+            s = scores.reindex(labels.index).fillna(0.0).values
+            y = labels.values
+        else:
+            if len(output) != len(valid_df):
+                raise ValueError(f"cannot align {len(output)} results with {len(valid_df)} unlabeled-id rows")
+            y, s = valid_df[label_column].values, output["risk_score"].values
+
+        result["score"] = METRICS[_SHARED["metric"]](np.asarray(y).astype(int), np.asarray(s, dtype=np.float64))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def _make_executor(max_workers: Optional[int], shared: Dict[str, Any]) -> ProcessPoolExecutor:
+    _SHARED.clear()
+    _SHARED.update(shared)
+    if "fork" in multiprocessing.get_all_start_methods():
+        # workers inherit the parent's dataset pages copy-on-write
+        return ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("fork"),
+                                   initializer=_init_worker, initargs=(None,))
+    # spawn: the dataset is pickled once per worker, never per candidate
+    return ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(shared,))
+
+
+def _run_round(executor, candidates: List[Dict[str, Any]], fraction: float, seed: int) -> List[Dict[str, Any]]:
+    futures = [executor.submit(_evaluate, c, fraction, seed) for c in candidates]
+    return [f.result() for f in futures]
+
+
+def _rank_key(result: Dict[str, Any]) -> float:
+    score = result["score"]
+    return -math.inf if score is None or math.isnan(score) else score
+
+
+def sweep(
+    model_dir: str,
+    train_df: pd.DataFrame,
+    valid_df: pd.DataFrame,
+    strategy: str = "random",
+    space: Optional[Space] = None,
+    n_candidates: int = 20,
+    metric: str = "roc_auc",
+    label_column: str = "label",
+    id_column: str = "entity_id",
+    max_workers: Optional[int] = None,
+    eta: int = 3,
+    min_fraction: float = 0.05,
+    seed: int = 0
+) -> pd.DataFrame:
+    '''
+    run a hyperparameter sweep for the model package at model_dir
+
+    strategy: grid, random or halving (successive halving over random
+    candidates: every rung trains on eta times more data and keeps the best
+    1/eta of the candidates). valid_df must carry label_column (1 = anomalous);
+    results are joined to labels on id_column when present, else by position.
+    returns one row per evaluated candidate, best first
+    '''
+    if metric not in METRICS:
+        raise ValueError(f"unknown metric: {metric}, expected one of {list(METRICS)}")
+    if label_column not in valid_df.columns:
+        raise ValueError(f"validation set has no label column '{label_column}'")
+
+    schema = load_parameter_schema(model_dir)
+    space = space if space is not None else default_space(schema)
+    defaults = {name: spec.get("default") for name, spec in schema.items()}
+
+    if strategy == "grid":
+        candidates = grid_candidates(space, schema)
+    elif strategy in ("random", "halving"):
+        candidates = random_candidates(space, schema, n_candidates, seed)
+    else:
+        raise ValueError(f"unknown strategy: {strategy}")
+    logger.info(f"sweeping {len(candidates)} candidates for {model_dir} ({strategy})")
+
+    shared = {
+        "model_dir": model_dir,
+        "defaults": defaults,
+        "train": train_df,
+        "valid": valid_df,
+        "metric": metric,
+        "label_column": label_column,
+        "id_column": id_column,
+    }
+    results: List[Dict[str, Any]] = []
+    with _make_executor(max_workers, shared) as executor:
+        if strategy != "halving":
+            results = _run_round(executor, candidates, 1.0, seed)
+        else:
+            rungs = max(0, math.ceil(math.log(len(candidates), eta)) - 1) if candidates else 0
+            for rung in range(rungs + 1):
+                fraction = max(min_fraction, float(eta) ** (rung - rungs))
+                rung_results = _run_round(executor, candidates, fraction, seed)
+                for r in rung_results:
+                    r["rung"] = rung
+                results.extend(rung_results)
+                keep = max(1, len(candidates) // eta) if rung < rungs else len(candidates)
+                survivors = sorted(rung_results, key=_rank_key, reverse=True)[:keep]
+                logger.info(f"rung {rung}: fraction={fraction:.3f}, kept {len(survivors)}/{len(candidates)}")
+                candidates = [r["params"] for r in survivors]
+    _SHARED.clear()
+
+    table = pd.DataFrame([
+        dict(r["params"], score=r["score"], fraction=r["fraction"], rung=r.get("rung", 0),
+             seconds=r["seconds"], error=r["error"])
+        for r in results
+    ])
+    if table.empty:
+        return table
+    # a candidate's standing is its result on the largest fraction it reached
+    table = table.sort_values(["rung", "score"], ascending=[False, False], na_position="last")
+    return table.reset_index(drop=True)
@@ -6,7 +6,10 @@ supports both v1 (execute) and v2 (train/infer) interfaces
 '''
 
 import os
+import sys
 import logging
+import importlib
+import types
 from typing import Dict, Any, List, Optional
 import pandas as pd
 
@@ -49,6 +52,17 @@ class Model:
         df = ctx.df if hasattr(ctx, 'df') else None
         params = ctx.params if hasattr(ctx, 'params') else {}
 
+        if params.get("mode") == "sketch" and df is not None:
+            # df may also be an iterable of chunks, streamed straight into the sketches
+            anomalies = _sketch_anomalies(df, params)
+            ctx.logger.info(f"sketch detection found {len(anomalies)} anomalies")
+            return pd.DataFrame(anomalies) if anomalies else pd.DataFrame(columns=["entity_id", "entity_type", "risk_score", "anomaly_type", "timestamp", "details"])
+
+        if params.get("mode") == "window" and df is not None:
+            anomalies = _window_anomalies(df, params)
+            ctx.logger.info(f"windowed detection found {len(anomalies)} anomalies")
+            return pd.DataFrame(anomalies) if anomalies else pd.DataFrame(columns=["entity_id", "entity_type", "risk_score", "anomaly_type", "timestamp", "details"])
+
         if df is None or len(df) == 0:
             ctx.logger.warning("no data provided in context")
             return pd.DataFrame(columns=["entity_id", "entity_type", "risk_score", "anomaly_type", "timestamp", "details"])
@@ -185,6 +199,11 @@ def _execute_inference(input_data: Optional[Dict[str, Any]] = None) -> Dict[str,
         
         else:
             logger.warning(f"unknown data source: {data_source}")
+
+        if input_data.get("mode") == "sketch" and df is not None:
+            anomalies.extend(_sketch_anomalies(df, input_data))
+        elif input_data.get("mode") == "window" and df is not None:
+            anomalies.extend(_window_anomalies(df, input_data))
     
     except Exception as e:
         logger.error(f"model execution failed: {e}")
@@ -206,3 +225,85 @@ def _execute_inference(input_data: Optional[Dict[str, Any]] = None) -> Dict[str,
         "data_rows_processed": len(df) if df is not None else 0
     }
 
+
+def _iter_chunks(data: Any, chunk_size: int):
+    '''
+    yield dataframe chunks from an adapter result
+    accepts a single dataframe (sliced into chunk_size rows) or any iterable of
+    dataframes, e.g. a chunked csv reader
+    '''
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, len(data), chunk_size):
+            yield data.iloc[start:start + chunk_size]
+    else:
+        for chunk in data:
+            yield chunk
+
+
+def _sibling_module(name: str):
+    '''
+    import a helper module shipped next to this file, both when the model is
+    imported as a package and when MODEL.py is loaded standalone by file path
+    '''
+    if __package__:
+        return importlib.import_module(f"{__package__}.{name}")
+    # standalone: import through a bare package shell over this directory so
+    # the helpers keep their relative imports and stay picklable
+    package = "_basic_model"
+    if package not in sys.modules:
+        shell = types.ModuleType(package)
+        shell.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+        sys.modules[package] = shell
+    return importlib.import_module(f"{package}.{name}")
+
+
+def _sketch_anomalies(data: Any, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    '''
+    sketch-based per-entity detection in a single streaming pass
+    state is merged with and written back to params["state_path"] when given,
+    so counts accumulate across partitions and runs
+    '''
+    EntitySketch = _sibling_module("sketches").EntitySketch
+
+    sketch = EntitySketch(
+        entity_column=params.get("entity_column", "user_id"),
+        distinct_column=params.get("distinct_column"),
+        top_k=params.get("top_k", 100)
+    )
+    state_path = params.get("state_path")
+    if state_path and os.path.exists(state_path):
+        sketch.load(state_path)
+
+    sketch.update_chunks(_iter_chunks(data, params.get("chunk_size", 100000)))
+    logger.info(f"sketch updated: {sketch.total} events, ~{int(sketch.entities.estimate())} entities")
+
+    if state_path:
+        sketch.save(state_path)
+
+    return sketch.anomalies(
+        volume_factor=params.get("volume_factor", 10.0),
+        min_events=params.get("min_events", 100),
+        distinct_threshold=params.get("distinct_threshold")
+    )
+
+
+def _window_anomalies(data: Any, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    '''
+    per-entity, per-window volume anomalies in a single streaming pass
+    '''
+    WindowedVolume = _sibling_module("windows").WindowedVolume
+
+    engine = WindowedVolume(
+        entity_column=params.get("entity_column", "user_id"),
+        time_column=params.get("time_column", "timestamp"),
+        window=params.get("window", "1h"),
+        slide=params.get("slide") or None,
+        alpha=params.get("baseline_alpha", 0.1),
+        z_threshold=params.get("z_threshold", 3.0),
+        min_history=params.get("min_history", 3),
+        min_events=params.get("min_events", 10)
+    )
+    anomalies = engine.update_chunks(_iter_chunks(data, params.get("chunk_size", 100000)))
+    logger.info(f"windowed engine processed {engine.events} events for {len(engine.entities)} entities"
+                f" ({engine.late_events} late events dropped)")
+    return anomalies
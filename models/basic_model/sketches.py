@@ -0,0 +1,414 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+fixed-memory streaming sketches for the basic model
+count-min sketch (per-entity event counts), hyperloglog (distinct values),
+space-saving top-k (heavy hitters) and an entity detector that combines them.
+every structure is updated with vectorized numpy ops on whole chunks and is
+mergeable, so state can be combined across partitions and persisted across runs
+'''
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+_HASH_KEY = "openuba-sketch01"
+_U64 = np.uint64
+# odd 64-bit multipliers for deriving independent row hashes from one hash
+_MULTIPLIERS = (
+    0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+    0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53,
+)
+
+
+def _key_strings(uniques: np.ndarray) -> np.ndarray:
+    '''
+    canonical string per unique value: integral floats are written as ints, so
+    an id column reads the same whether a chunk was parsed as int or as float
+    (pandas turns int columns with a missing value into float64)
+    '''
+    if uniques.dtype.kind == "f":
+        keys = uniques.astype(str).astype(object)
+        integral = np.isfinite(uniques) & (np.abs(uniques) < 2.0 ** 63) & (uniques == np.round(uniques))
+        keys[integral] = uniques[integral].astype(np.int64).astype(str)
+        return keys
+    if uniques.dtype.kind == "O":
+        return np.array([
+            str(int(v)) if isinstance(v, float) and v.is_integer() else str(v)
+            for v in uniques.tolist()
+        ], dtype=object)
+    return uniques.astype(str).astype(object)
+
+
+def factorize_keys(values: Any) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    factorize values into (codes, canonical string keys); -1 marks missing.
+    uniques are canonicalized (not rows) and factorized again, since distinct
+    raw values can share a key, e.g. 1001 and 1001.0
+    '''
+    codes, uniques = pd.factorize(np.asarray(values), use_na_sentinel=True)
+    labels, keys = pd.factorize(_key_strings(np.asarray(uniques)))
+    codes = np.where(codes >= 0, labels[codes], -1)
+    return codes, np.asarray(keys, dtype=object)
+
+
+def hash_values(values: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    factorize values and return (codes, string keys, uint64 hash per key)
+    keys are canonical strings (see factorize_keys), so hashes are stable
+    across chunks and runs regardless of the dtype a given chunk was parsed with
+    '''
+    codes, keys = factorize_keys(values)
+    return codes, keys, pd.util.hash_array(keys, hash_key=_HASH_KEY)
+
+
+def _row_index(hashes: np.ndarray, row: int, width: int) -> np.ndarray:
+    mixed = hashes * _U64(_MULTIPLIERS[row % len(_MULTIPLIERS)])
+    return ((mixed >> _U64(32)) % _U64(width)).astype(np.int64)
+
+
+def _hll_index_rank(hashes: np.ndarray, p: int) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    split hashes into register index (top p bits) and rank (leading zeros + 1)
+    '''
+    idx = (hashes >> _U64(64 - p)).astype(np.int64)
+    rest = hashes & _U64((1 << (64 - p)) - 1)
+    nonzero = rest != 0
+    bits = np.zeros(len(rest), dtype=np.int64)
+    if nonzero.any():
+        r = rest[nonzero]
+        k = np.floor(np.log2(r.astype(np.float64))).astype(np.int64)
+        # float rounding can push values just below a power of two up by one
+        k -= ((_U64(1) << k.astype(_U64)) > r).astype(np.int64)
+        bits[nonzero] = k + 1
+    rank = (64 - p) - bits + 1
+    return idx, rank.astype(np.uint8)
+
+
+def _hll_estimate(registers: np.ndarray) -> np.ndarray:
+    '''
+    hyperloglog estimate over the last axis, with linear counting for small ranges
+    '''
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213)
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=-1)
+    zeros = np.sum(registers == 0, axis=-1)
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where(small, linear, raw)
+
+
+class CountMinSketch:
+    '''
+    count-min sketch: depth x width counters, estimates never undercount
+    '''
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def add(self, hashes: np.ndarray, counts: np.ndarray) -> None:
+        for row in range(self.depth):
+            idx = _row_index(hashes, row, self.width)
+            self.table[row] += np.bincount(idx, weights=counts, minlength=self.width).astype(np.int64)
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        rows = [self.table[row, _row_index(hashes, row, self.width)] for row in range(self.depth)]
+        return np.min(rows, axis=0)
+
+    def merge(self, other: "CountMinSketch") -> None:
+        if self.table.shape != other.table.shape:
+            raise ValueError("cannot merge count-min sketches of different shape")
+        self.table += other.table
+
+
+class HyperLogLog:
+    '''
+    hyperloglog distinct counter with 2**p registers
+    '''
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def add(self, hashes: np.ndarray) -> None:
+        if len(hashes) == 0:
+            return
+        idx, rank = _hll_index_rank(hashes, self.p)
+        np.maximum.at(self.registers, idx, rank)
+
+    def estimate(self) -> float:
+        return float(_hll_estimate(self.registers))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if self.p != other.p:
+            raise ValueError("cannot merge hyperloglogs of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+
+class CountMinHyperLogLog:
+    '''
+    per-entity distinct counts in fixed memory: a count-min grid whose cells are
+    small hyperloglogs. an entity's estimate is the minimum over its cells, so
+    hash collisions can only inflate it
+    '''
+
+    def __init__(self, width: int = 1024, depth: int = 2, p: int = 6):
+        self.width = width
+        self.depth = depth
+        self.p = p
+        self.registers = np.zeros((depth, width, 1 << p), dtype=np.uint8)
+
+    def add(self, entity_hashes: np.ndarray, value_hashes: np.ndarray) -> None:
+        if len(value_hashes) == 0:
+            return
+        reg, rank = _hll_index_rank(value_hashes, self.p)
+        m = 1 << self.p
+        for row in range(self.depth):
+            cell = _row_index(entity_hashes, row, self.width)
+            np.maximum.at(self.registers[row].reshape(-1), cell * m + reg, rank)
+
+    def estimate(self, entity_hashes: np.ndarray) -> np.ndarray:
+        cells = _hll_estimate(self.registers)
+        rows = [cells[row, _row_index(entity_hashes, row, self.width)] for row in range(self.depth)]
+        return np.min(rows, axis=0)
+
+    def merge(self, other: "CountMinHyperLogLog") -> None:
+        if self.registers.shape != other.registers.shape:
+            raise ValueError("cannot merge count-min hyperloglogs of different shape")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+
+class SpaceSaving:
+    '''
+    space-saving top-k summary: keeps at most k (count, error) entries.
+    chunks are folded in as pre-aggregated counts using the mergeable
+    summary rule, so updates cost O(k + distinct keys in chunk)
+    '''
+
+    def __init__(self, k: int = 100):
+        self.k = k
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def _floor(self) -> int:
+        return min(self.counts.values()) if len(self.counts) >= self.k else 0
+
+    def add(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        if len(keys) > self.k:
+            top = np.argpartition(counts, -self.k)[-self.k:]
+            floor = int(np.max(np.delete(counts, top)))
+            keys, counts = keys[top], counts[top]
+        else:
+            floor = 0
+        other = SpaceSaving(self.k)
+        other.counts = dict(zip(keys.tolist(), (int(c) for c in counts)))
+        other.errors = dict.fromkeys(other.counts, 0)
+        self._merge(other, floor)
+
+    def merge(self, other: "SpaceSaving") -> None:
+        self._merge(other, other._floor())
+
+    def _merge(self, other: "SpaceSaving", other_floor: int) -> None:
+        own_floor = self._floor()
+        counts, errors = {}, {}
+        for key in self.counts.keys() | other.counts.keys():
+            counts[key] = self.counts.get(key, own_floor) + other.counts.get(key, other_floor)
+            errors[key] = (
+                (self.errors[key] if key in self.counts else own_floor)
+                + (other.errors[key] if key in other.counts else other_floor)
+            )
+        keep = sorted(counts, key=counts.get, reverse=True)[:self.k]
+        self.counts = {key: counts[key] for key in keep}
+        self.errors = {key: errors[key] for key in keep}
+
+    def top(self) -> List[Tuple[str, int, int]]:
+        return [(key, self.counts[key], self.errors[key]) for key in sorted(self.counts, key=self.counts.get, reverse=True)]
+
+
+class EntitySketch:
+    '''
+    streaming per-entity detector: count-min counts, global and per-entity
+    hyperloglogs and a space-saving top-k, updated chunk by chunk.
+    distinct-value candidates are tracked apart from the volume top-k, so a
+    low-rate entity touching many distinct values (e.g. a slow scanner) is
+    still evaluated even though it never becomes a heavy hitter
+    '''
+
+    def __init__(
+        self,
+        entity_column: str = "user_id",
+        distinct_column: Optional[str] = None,
+        top_k: int = 100,
+        cms_width: int = 2048,
+        cms_depth: int = 4,
+        hll_precision: int = 12
+    ):
+        self.entity_column = entity_column
+        self.distinct_column = distinct_column
+        self.total = 0
+        self.counts = CountMinSketch(cms_width, cms_depth)
+        self.entities = HyperLogLog(hll_precision)
+        self.distinct = CountMinHyperLogLog()
+        self.top_k = SpaceSaving(top_k)
+        # up to top_k entities with the highest distinct estimates seen so far
+        self.distinct_top: Dict[str, float] = {}
+
+    def update(self, df: pd.DataFrame) -> None:
+        if df is None or len(df) == 0:
+            return
+        if self.entity_column not in df.columns:
+            raise ValueError(f"entity column '{self.entity_column}' not found in data: {list(df.columns)}")
+
+        codes, keys, hashes = hash_values(df[self.entity_column].values)
+        valid = codes >= 0
+        codes = codes[valid]
+        per_entity = np.bincount(codes, minlength=len(hashes))
+
+        self.total += int(len(codes))
+        self.counts.add(hashes, per_entity)
+        self.entities.add(hashes)
+        self.top_k.add(keys, per_entity)
+
+        if self.distinct_column and self.distinct_column in df.columns:
+            value_codes, _, value_hashes = hash_values(df[self.distinct_column].values[valid])
+            has_value = value_codes >= 0
+            self.distinct.add(hashes[codes[has_value]], value_hashes[value_codes[has_value]])
+            seen = np.unique(codes[has_value])
+            self._track_distinct(keys[seen], hashes[seen])
+
+    def _track_distinct(self, keys: np.ndarray, hashes: np.ndarray) -> None:
+        '''
+        re-estimate the given entities and keep the top_k by distinct count.
+        the grid holds each entity's full history and only grows, so an entity
+        evicted earlier re-enters with its cumulative estimate when it shows up again
+        '''
+        if len(keys) == 0:
+            return
+        estimates = self.distinct.estimate(hashes)
+        if len(keys) > self.top_k.k:
+            top = np.argpartition(estimates, -self.top_k.k)[-self.top_k.k:]
+            keys, estimates = keys[top], estimates[top]
+        candidates = dict(self.distinct_top)
+        candidates.update(zip(keys.tolist(), estimates.tolist()))
+        keep = sorted(candidates, key=candidates.get, reverse=True)[:self.top_k.k]
+        self.distinct_top = {key: candidates[key] for key in keep}
+
+    def update_chunks(self, chunks: Iterable[pd.DataFrame]) -> "EntitySketch":
+        for chunk in chunks:
+            self.update(chunk)
+        return self
+
+    def merge(self, other: "EntitySketch") -> None:
+        self.total += other.total
+        self.counts.merge(other.counts)
+        self.entities.merge(other.entities)
+        self.distinct.merge(other.distinct)
+        self.top_k.merge(other.top_k)
+        keys = np.array(list(self.distinct_top.keys() | other.distinct_top.keys()), dtype=object)
+        self.distinct_top = {}
+        self._track_distinct(keys, pd.util.hash_array(keys, hash_key=_HASH_KEY))
+
+    def anomalies(
+        self,
+        volume_factor: float = 10.0,
+        min_events: int = 100,
+        distinct_threshold: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        '''
+        flag tracked heavy hitters whose event count exceeds volume_factor x the
+        mean per-entity count, and tracked distinct candidates with at least
+        distinct_threshold distinct values
+        '''
+        timestamp = pd.Timestamp.now()
+        anomalies = []
+
+        top = self.top_k.top()
+        if top:
+            keys = np.array([key for key, _, _ in top], dtype=object)
+            hashes = pd.util.hash_array(keys, hash_key=_HASH_KEY)
+            counts = np.minimum(self.counts.estimate(hashes), [count for _, count, _ in top])
+            n_entities = max(1.0, self.entities.estimate())
+            mean = self.total / n_entities
+            for i, key in enumerate(keys):
+                count = int(counts[i])
+                if count >= min_events and count >= volume_factor * mean:
+                    ratio = count / max(mean, 1e-9)
+                    anomalies.append({
+                        "entity_id": key,
+                        "entity_type": "user",
+                        "risk_score": float(min(1.0, 0.5 + 0.1 * np.log2(ratio / volume_factor + 1))),
+                        "anomaly_type": "heavy_hitter",
+                        "timestamp": timestamp,
+                        "details": {
+                            "event_count": count,
+                            "count_error": int(top[i][2]),
+                            "mean_entity_count": float(mean),
+                            "estimated_entities": int(round(n_entities))
+                        }
+                    })
+
+        if self.distinct_column and distinct_threshold and self.distinct_top:
+            keys = np.array(list(self.distinct_top), dtype=object)
+            distinct = self.distinct.estimate(pd.util.hash_array(keys, hash_key=_HASH_KEY))
+            for key, value in zip(keys, distinct.tolist()):
+                if value >= distinct_threshold:
+                    anomalies.append({
+                        "entity_id": key,
+                        "entity_type": "user",
+                        "risk_score": float(min(1.0, 0.5 + 0.1 * np.log2(value / distinct_threshold + 1))),
+                        "anomaly_type": f"high_distinct_{self.distinct_column}",
+                        "timestamp": timestamp,
+                        "details": {
+                            f"distinct_{self.distinct_column}": int(round(value)),
+                            "threshold": distinct_threshold
+                        }
+                    })
+        return anomalies
+
+    def save(self, path: str) -> None:
+        keys, counts, errors = zip(*self.top_k.top()) if self.top_k.counts else ((), (), ())
+        # write through a file handle so numpy doesn't append .npz to the path
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                total=np.int64(self.total),
+                cms=self.counts.table,
+                entities=self.entities.registers,
+                distinct=self.distinct.registers,
+                topk_keys=np.array(keys, dtype=str),
+                topk_counts=np.array(counts, dtype=np.int64),
+                topk_errors=np.array(errors, dtype=np.int64),
+                topk_capacity=np.int64(self.top_k.k),
+                distinct_keys=np.array(list(self.distinct_top), dtype=str)
+            )
+
+    def load(self, path: str) -> "EntitySketch":
+        '''
+        merge previously saved state into this sketch
+        '''
+        with np.load(path, allow_pickle=False) as state:
+            other = EntitySketch(
+                self.entity_column,
+                self.distinct_column,
+                top_k=int(state["topk_capacity"]),
+                cms_width=state["cms"].shape[1],
+                cms_depth=state["cms"].shape[0],
+                hll_precision=int(np.log2(state["entities"].shape[0]))
+            )
+            other.total = int(state["total"])
+            other.counts.table = state["cms"].copy()
+            other.entities.registers = state["entities"].copy()
+            other.distinct.registers = state["distinct"].copy()
+            keys = state["topk_keys"].astype(object).tolist()
+            other.top_k.counts = dict(zip(keys, state["topk_counts"].tolist()))
+            other.top_k.errors = dict(zip(keys, state["topk_errors"].tolist()))
+            if "distinct_keys" in state.files:
+                # estimates are recomputed from the grid when merged
+                other.distinct_top = dict.fromkeys(state["distinct_keys"].astype(object).tolist(), 0.0)
+        self.merge(other)
+        return self
@@ -3,15 +3,6 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-class ModelContext:
-    '''
-    Mock context for local execution/testing if not provided by runner
-    '''
-    def __init__(self, df=None, params: Dict[str, Any] = None):
-        self.df = df
-        self.params = params or {}
-        self.logger = logger
-
 class Model:
     def __init__(self):
         self.model_state = {}
@@ -40,12 +31,14 @@ class Model:
         '''
         import pandas as pd
         ctx.logger.info("model_1 v2 inference...")
+        params = getattr(ctx, 'hyperparameters', None) or {}
+        sensitivity = params.get("sensitivity", 0.85)
         # Simulate inference logic
         results = []
         for i in range(5):
             results.append({
                 "user_id": f"user_{i}",
-                "risk_score": 0.85 + (i * 0.01),
+                "risk_score": sensitivity + (i * 0.01),
                 "reason": "simulated_anomaly"
             })
         
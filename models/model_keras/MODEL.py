@@ -5,6 +5,23 @@ from tensorflow import keras
 from tensorflow.keras import layers
 from typing import Dict, Any
 
+
+def _entity_ids(df, n: int) -> pd.Categorical:
+    """
+    Entity ids as int32 codes plus one array of string categories, taken from
+    the entity_id/user_id column, or "entity_<i>" when the data has none.
+    """
+    for col in ("entity_id", "user_id"):
+        if df is not None and col in df.columns:
+            codes, uniques = pd.factorize(df[col])
+            # Stringify the uniques, not the rows, then merge any that collide (1 and "1")
+            labels, categories = pd.factorize(np.asarray(uniques).astype(str))
+            codes = np.where(codes >= 0, labels[codes], -1).astype(np.int32)
+            return pd.Categorical.from_codes(codes, categories=categories)
+    categories = pd.Index(np.char.add("entity_", np.arange(n).astype(str)))
+    return pd.Categorical.from_codes(np.arange(n, dtype=np.int32), categories=categories)
+
+
 class Model:
     def __init__(self):
         self.model = None
@@ -44,7 +61,13 @@ class Model:
         
         self.model = self._build_model(self.input_dim)
         
-        history = self.model.fit(X_reshaped, X_reshaped, epochs=5, batch_size=32, verbose=0)
+        params = getattr(ctx, 'hyperparameters', None) or {}
+        history = self.model.fit(
+            X_reshaped, X_reshaped,
+            epochs=params.get("epochs", 5),
+            batch_size=params.get("batch_size", 32),
+            verbose=0
+        )
         final_loss = history.history['loss'][-1]
         
         ctx.logger.info(f"Training completed. Final MAE: {final_loss}")
@@ -74,10 +97,7 @@ class Model:
                      padding = np.zeros((X.shape[0], self.input_dim - X.shape[1]), dtype=np.float32)
                      X = np.hstack((X, padding))
             
-            if "entity_id" in ctx.df.columns:
-                ids = ctx.df["entity_id"].values
-            else:
-                ids = [f"entity_{i}" for i in range(len(X))]
+            ids = _entity_ids(ctx.df, len(X))
                 
         if self.model is None:
              self.model = self._build_model(self.input_dim)
@@ -88,17 +108,15 @@ class Model:
         
         mae = np.mean(np.abs(X - reconstructions), axis=1)
         
-        results = []
-        for i, score in enumerate(mae):
-            risk = min(100.0, float(score) * 100)
-            results.append({
-                "entity_id": str(ids[i]),
-                "risk_score": float(risk),
-                "anomaly_type": "seq_outlier" if risk > 50 else "normal",
-                "details": {"mae": float(score)}
-            })
-            
-        return pd.DataFrame(results)
+        mae = np.asarray(mae, dtype=np.float64)
+        risk = np.minimum(100.0, mae * 100)
+
+        return pd.DataFrame({
+            "entity_id": ids,
+            "risk_score": risk,
+            "anomaly_type": np.where(risk > 50, "seq_outlier", "normal"),
+            "details": [{"mae": score} for score in mae.tolist()]
+        })
 
     def execute(self, data=None):
          # shim for v1
@@ -1,11 +1,18 @@
 
+import numpy as np
 import pandas as pd
 import networkx as nx
-from typing import Dict, Any
+from collections import deque
+from typing import Dict, Any, Hashable, Iterable, Optional, Union
 
 class Model:
     def __init__(self):
         self.graph = None
+        # Nodes are int codes into this index of entity labels, so the graph
+        # never holds one Python string object per node
+        self.node_labels = None
+        # Community id per node, computed once per graph
+        self.communities = None
         
     def train(self, ctx) -> Dict[str, Any]:
         """
@@ -14,6 +21,9 @@ class Model:
         ctx.logger.info("Starting NetworkX Graph construction...")
         
         G = nx.Graph()
+        self.node_labels = None
+        self.communities = None
+        params = getattr(ctx, 'hyperparameters', None) or {}
         
         if isinstance(ctx.df, dict):
             # SourceGroup multi-table support: pick first available source for now
@@ -29,9 +39,9 @@ class Model:
             ctx.logger.warning("No data, generating dummy graph")
             # Generate random edges between 20 nodes
             import random
-            nodes = [f"user_{i}" for i in range(20)]
+            self.node_labels = pd.Index([f"user_{i}" for i in range(20)])
             for _ in range(50):
-                u, v = random.sample(nodes, 2)
+                u, v = random.sample(range(20), 2)
                 G.add_edge(u, v)
         else:
 
@@ -39,13 +49,6 @@ class Model:
             source_col = "source"
             target_col = "target"
             
-            # Check for hyperparameters (safely access if attribute or dict)
-            params = {}
-            if hasattr(ctx, 'hyperparameters'):
-                params = ctx.hyperparameters or {}
-            elif isinstance(ctx, dict) and 'hyperparameters' in ctx:
-                params = ctx['hyperparameters'] or {}
-                
             if params.get('source_column'):
                 source_col = params['source_column']
             if params.get('target_column'):
@@ -62,7 +65,8 @@ class Model:
                     target_col = cols[1]
                 else:
                     ctx.logger.warning("Not enough columns for graph, using dummy")
-                    G.add_node("dummy_node")
+                    self.node_labels = pd.Index(["dummy_node"])
+                    G.add_node(0)
                     self.graph = G
                     return {
                         "status": "warning",
@@ -71,11 +75,21 @@ class Model:
                         "edges": 0
                     }
 
-            edges = list(zip(ctx.df[source_col], ctx.df[target_col]))
-            G.add_edges_from(edges)
+            # Factorize both endpoint columns together so each entity gets one code
+            n_edges = len(ctx.df)
+            codes, uniques = pd.factorize(pd.concat([ctx.df[source_col], ctx.df[target_col]], ignore_index=True))
+            # Stringify the uniques, then merge any that collide (1 and "1") so
+            # each entity id maps to exactly one node
+            labels, categories = pd.factorize(np.asarray(uniques).astype(str))
+            codes = np.where(codes >= 0, labels[codes], -1).astype(np.int32)
+            self.node_labels = pd.Index(categories)
+            valid = (codes[:n_edges] >= 0) & (codes[n_edges:] >= 0)
+            G.add_edges_from(zip(codes[:n_edges][valid].tolist(), codes[n_edges:][valid].tolist()))
         
         self.graph = G
         ctx.logger.info(f"Graph constructed. Nodes: {G.number_of_nodes()}, Edges: {G.number_of_edges()}")
+        if params.get("community_detection", True):
+            self._detect_communities()
         
         return {
             "status": "success",
@@ -103,24 +117,162 @@ class Model:
         # Users want anomalies. Let's say high Pagerank = "Key Player" (Anomaly type)
         # Or low pagerank = "Isolate".
         
-        results = []
-        for node, score in pagerank.items():
-            # Normalize score for risk 0-100? PageRank sums to 1.
-            # Multiply by N to normalize relative to uniform?
-            N = self.graph.number_of_nodes()
-            relative_score = score * N 
-            
-            # Simple heuristic: heavily central nodes are "risky" or "important"
-            risk = min(100.0, relative_score * 20)
-            
-            results.append({
-                "entity_id": str(node),
-                "risk_score": float(risk),
-                "anomaly_type": "high_centrality" if risk > 50 else "normal",
-                "details": {"pagerank": float(score)}
-            })
-            
-        return pd.DataFrame(results)
+        nodes = list(pagerank)
+        scores = np.fromiter(pagerank.values(), dtype=np.float64, count=len(nodes))
+
+        # Normalize score for risk 0-100? PageRank sums to 1.
+        # Multiply by N to normalize relative to uniform?
+        N = self.graph.number_of_nodes()
+        relative_score = scores * N
+
+        # Simple heuristic: heavily central nodes are "risky" or "important"
+        risk = np.minimum(100.0, relative_score * 20)
+
+        # Degree above max_degree is an anomaly on its own; a node at the
+        # threshold scores 50, the same cut-off as high centrality
+        params = getattr(ctx, 'hyperparameters', None) or {}
+        max_degree = max(1, int(params.get("max_degree", 50)))
+        degrees = np.fromiter((d for _, d in self.graph.degree(nodes)), dtype=np.int64, count=len(nodes))
+        degree_risk = np.minimum(100.0, degrees / max_degree * 50.0)
+        anomaly_type = np.where(
+            risk > 50, "high_centrality", np.where(degrees > max_degree, "high_degree", "normal")
+        )
+        risk = np.maximum(risk, degree_risk)
+
+        details = [
+            {"pagerank": score, "degree": degree}
+            for score, degree in zip(scores.tolist(), degrees.tolist())
+        ]
+        if params.get("community_detection", True):
+            community = self._detect_communities()
+            for node, detail in zip(nodes, details):
+                detail["community"] = community[node]
+
+        return pd.DataFrame({
+            "entity_id": self._entity_labels(nodes),
+            "risk_score": risk,
+            "anomaly_type": anomaly_type,
+            "details": details
+        })
+
+    def _detect_communities(self) -> Dict[Hashable, int]:
+        """
+        Community id per node via label propagation (no scipy needed).
+        Runs once per graph: train computes it, infer reuses it
+        """
+        if self.communities is None:
+            communities = nx.community.label_propagation_communities(self.graph)
+            self.communities = {node: i for i, members in enumerate(communities) for node in members}
+        return self.communities
+
+    def _entity_labels(self, nodes) -> pd.Categorical:
+        """
+        Map graph nodes back to entity ids without allocating a string per row
+        """
+        if self.node_labels is None:
+            # Graph assigned directly rather than built by train()
+            return pd.Categorical([str(node) for node in nodes])
+        return pd.Categorical.from_codes(np.asarray(nodes, dtype=np.int32), categories=self.node_labels)
+
+    def personalized_pagerank(
+        self,
+        seeds: Union[Hashable, Iterable[Hashable], Dict[Hashable, float]],
+        alpha: float = 0.85,
+        tol: float = 1e-4,
+        top_k: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Approximate personalized PageRank from one or a few seed nodes.
+
+        Uses the local forward-push scheme (Andersen, Chung & Lang): residual
+        mass is pushed from a node only while it exceeds tol * degree, so the
+        cost depends on the neighborhood touched instead of the graph size.
+        alpha is the damping factor, matching nx.pagerank. Seeds may be a single
+        node, a list of nodes, or a dict of node -> personalization weight.
+
+        The default tol keeps single-seed queries in the millisecond range on
+        graphs with millions of edges; lower it (e.g. 1e-6) when scores for
+        distant, low-mass nodes matter more than latency.
+        """
+        if self.graph is None:
+            raise ValueError("Graph not built. Call train() before querying.")
+        if not 0.0 < alpha < 1.0:
+            raise ValueError(f"alpha must be in (0, 1), got {alpha}")
+        if tol <= 0.0:
+            raise ValueError(f"tol must be positive, got {tol}")
+
+        if isinstance(seeds, dict):
+            weights = dict(seeds)
+        elif isinstance(seeds, (str, bytes)) or not isinstance(seeds, Iterable):
+            weights = {seeds: 1.0}
+        else:
+            weights = {s: 1.0 for s in seeds}
+
+        if self.node_labels is not None:
+            # Seeds are entity ids; the graph is keyed on their int codes
+            codes = self.node_labels.get_indexer([str(s) for s in weights])
+            unknown = [s for s, c in zip(weights, codes) if c < 0]
+            if unknown:
+                raise ValueError(f"Seed nodes not in graph: {unknown[:10]}")
+            weights = {int(c): w for c, w in zip(codes, weights.values())}
+
+        adj = self.graph.adj
+        missing = [s for s in weights if s not in adj]
+        if missing:
+            raise ValueError(f"Seed nodes not in graph: {missing[:10]}")
+        total = float(sum(weights.values()))
+        if total <= 0.0:
+            raise ValueError("Seed weights must sum to a positive value")
+        teleport = {s: w / total for s, w in weights.items()}
+
+        estimate = {}
+        residual = dict(teleport)
+        queue = deque(residual)
+        queued = set(queue)
+
+        while queue:
+            u = queue.popleft()
+            queued.discard(u)
+            r = residual.get(u, 0.0)
+            nbrs = adj[u]
+            deg = len(nbrs)
+            if r < tol * max(deg, 1):
+                continue
+
+            residual[u] = 0.0
+            estimate[u] = estimate.get(u, 0.0) + (1.0 - alpha) * r
+
+            # dangling nodes hand their mass back to the seeds, as nx.pagerank does
+            if deg:
+                targets = ((v, alpha * r / deg) for v in nbrs)
+            else:
+                targets = ((s, alpha * r * w) for s, w in teleport.items())
+
+            for v, mass in targets:
+                rv = residual.get(v, 0.0) + mass
+                residual[v] = rv
+                if v not in queued and rv >= tol * max(len(adj[v]), 1):
+                    queue.append(v)
+                    queued.add(v)
+
+        ranked = sorted(estimate.items(), key=lambda kv: kv[1], reverse=True)
+        if top_k is not None:
+            ranked = ranked[:top_k]
+        if not ranked:
+            return pd.DataFrame(columns=["entity_id", "risk_score", "anomaly_type", "details"])
+
+        # Scale relative to the strongest non-seed node so seeds don't swamp the ranking
+        peak = max((score for node, score in ranked if node not in teleport), default=ranked[0][1])
+        nodes = [node for node, _ in ranked]
+        scores = np.array([score for _, score in ranked], dtype=np.float64)
+        risk = np.minimum(100.0, scores / peak * 100.0) if peak > 0 else np.zeros(len(scores))
+
+        return pd.DataFrame({
+            "entity_id": self._entity_labels(nodes),
+            "risk_score": risk,
+            "anomaly_type": ["seed" if node in teleport else "proximal" for node in nodes],
+            "details": [{"ppr": score} for score in scores.tolist()]
+        })
 
     def execute(self, data=None):
          # shim for v1
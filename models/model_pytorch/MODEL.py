@@ -6,6 +6,23 @@ import torch.nn as nn
 import torch.optim as optim
 from typing import Dict, Any
 
+
+def _entity_ids(df, n: int) -> pd.Categorical:
+    """
+    Entity ids as int32 codes plus one array of string categories, taken from
+    the entity_id/user_id column, or "entity_<i>" when the data has none.
+    """
+    for col in ("entity_id", "user_id"):
+        if df is not None and col in df.columns:
+            codes, uniques = pd.factorize(df[col])
+            # Stringify the uniques, not the rows, then merge any that collide (1 and "1")
+            labels, categories = pd.factorize(np.asarray(uniques).astype(str))
+            codes = np.where(codes >= 0, labels[codes], -1).astype(np.int32)
+            return pd.Categorical.from_codes(codes, categories=categories)
+    categories = pd.Index(np.char.add("entity_", np.arange(n).astype(str)))
+    return pd.Categorical.from_codes(np.arange(n, dtype=np.int32), categories=categories)
+
+
 class Autoencoder(nn.Module):
     def __init__(self, input_dim):
         super(Autoencoder, self).__init__()
@@ -47,11 +64,12 @@ class Model:
         self.input_dim = X.shape[1]
         self.model = Autoencoder(self.input_dim)
         
+        params = getattr(ctx, 'hyperparameters', None) or {}
         criterion = nn.MSELoss()
-        optimizer = optim.Adam(self.model.parameters(), lr=0.01)
+        optimizer = optim.Adam(self.model.parameters(), lr=params.get("learning_rate", 0.01))
         
         # Training Loop
-        epochs = 50
+        epochs = params.get("epochs", 50)
         dataset = torch.tensor(X)
         self.model.train()
         
@@ -97,10 +115,7 @@ class Model:
                      padding = np.zeros((X.shape[0], self.input_dim - X.shape[1]), dtype=np.float32)
                      X = np.hstack((X, padding))
             
-            if "entity_id" in ctx.df.columns:
-                ids = ctx.df["entity_id"].values
-            else:
-                ids = [f"entity_{i}" for i in range(len(X))]
+            ids = _entity_ids(ctx.df, len(X))
 
         # Instantiate if not trained
         if self.model is None:
@@ -114,20 +129,17 @@ class Model:
             outputs = self.model(inputs)
             mse = torch.mean((inputs - outputs) ** 2, dim=1).numpy()
 
-        results = []
-        for i, score in enumerate(mse):
-            # Higher reconstruction error = higher anomaly risk
-            # Normalize reasonably for demo 0.0 - 2.0 -> 0 - 100
-            risk = min(100.0, float(score) * 50)
-            
-            results.append({
-                "entity_id": str(ids[i]),
-                "risk_score": float(risk),
-                "anomaly_type": "reconstruction_error" if risk > 50 else "normal",
-                "details": {"mse": float(score)}
-            })
-            
-        return pd.DataFrame(results)
+        # Higher reconstruction error = higher anomaly risk
+        # Normalize reasonably for demo 0.0 - 2.0 -> 0 - 100
+        mse = np.asarray(mse, dtype=np.float64)
+        risk = np.minimum(100.0, mse * 50)
+
+        return pd.DataFrame({
+            "entity_id": ids,
+            "risk_score": risk,
+            "anomaly_type": np.where(risk > 50, "reconstruction_error", "normal"),
+            "details": [{"mse": score} for score in mse.tolist()]
+        })
     
     def execute(self, data=None):
          # shim for v1
@@ -4,6 +4,23 @@ import numpy as np
 from sklearn.ensemble import IsolationForest
 from typing import Dict, Any
 
+
+def _entity_ids(df, n: int) -> pd.Categorical:
+    """
+    Entity ids as int32 codes plus one array of string categories, taken from
+    the entity_id/user_id column, or "entity_<i>" when the data has none.
+    """
+    for col in ("entity_id", "user_id"):
+        if df is not None and col in df.columns:
+            codes, uniques = pd.factorize(df[col])
+            # Stringify the uniques, not the rows, then merge any that collide (1 and "1")
+            labels, categories = pd.factorize(np.asarray(uniques).astype(str))
+            codes = np.where(codes >= 0, labels[codes], -1).astype(np.int32)
+            return pd.Categorical.from_codes(codes, categories=categories)
+    categories = pd.Index(np.char.add("entity_", np.arange(n).astype(str)))
+    return pd.Categorical.from_codes(np.arange(n, dtype=np.int32), categories=categories)
+
+
 class Model:
     def __init__(self):
         self.model = IsolationForest(contamination=0.1, random_state=42)
@@ -23,6 +40,11 @@ class Model:
         if X.shape[0] == 0 or X.shape[1] == 0:
             raise ValueError(f"Training data has no numeric columns (shape={ctx.df.shape}, numeric_shape={X.shape})")
             
+        params = getattr(ctx, 'hyperparameters', None) or {}
+        self.model = IsolationForest(
+            contamination=params.get("contamination", 0.1),
+            random_state=params.get("random_state", 42)
+        )
         self.model.fit(X)
         self.is_trained = True
         
@@ -51,12 +73,7 @@ class Model:
             raise ValueError(f"Inference data has no numeric columns (shape={ctx.df.shape}, numeric_shape={X.shape})")
 
         # Try to find an ID column
-        if "entity_id" in ctx.df.columns:
-            ids = ctx.df["entity_id"].values
-        elif "user_id" in ctx.df.columns:
-            ids = ctx.df["user_id"].values
-        else:
-            ids = [f"entity_{i}" for i in range(len(X))]
+        ids = _entity_ids(ctx.df, len(X))
 
         # Fit if needed (for demo purposes if weights loading isn't fully implemented in runner)
         if not hasattr(self.model, "estimators_"):
@@ -73,23 +90,20 @@ class Model:
         # We want risk score 0-100.
         # decision_function: lower is more anomalous.
 
-        results = []
-        for i, (pred, score) in enumerate(zip(predictions, scores)):
-            # convert score to risk (simple heuristic)
-            risk = 0.0
-            if pred == -1:
-                risk = min(100.0, abs(score) * 100 + 50)
-            else:
-                risk = max(0.0, (1 - score) * 20)
-                
-            results.append({
-                "entity_id": str(ids[i]),
-                "risk_score": float(risk),
-                "anomaly_type": "statistical_outlier" if pred == -1 else "normal",
-                "details": {"raw_score": float(score)}
-            })
-            
-        return pd.DataFrame(results)
+        # convert score to risk (simple heuristic)
+        outlier = predictions == -1
+        risk = np.where(
+            outlier,
+            np.minimum(100.0, np.abs(scores) * 100 + 50),
+            np.maximum(0.0, (1 - scores) * 20)
+        )
+
+        return pd.DataFrame({
+            "entity_id": ids,
+            "risk_score": risk.astype(np.float64),
+            "anomaly_type": np.where(outlier, "statistical_outlier", "normal"),
+            "details": [{"raw_score": score} for score in scores.astype(np.float64).tolist()]
+        })
 
     def execute(self, data=None):
         # shim for v1 interface
@@ -4,19 +4,41 @@ import numpy as np
 import tensorflow as tf
 from typing import Dict, Any
 
+
+def _entity_ids(df, n: int) -> pd.Categorical:
+    """
+    Entity ids as int32 codes plus one array of string categories, taken from
+    the entity_id/user_id column, or "entity_<i>" when the data has none.
+    """
+    for col in ("entity_id", "user_id"):
+        if df is not None and col in df.columns:
+            codes, uniques = pd.factorize(df[col])
+            # Stringify the uniques, not the rows, then merge any that collide (1 and "1")
+            labels, categories = pd.factorize(np.asarray(uniques).astype(str))
+            codes = np.where(codes >= 0, labels[codes], -1).astype(np.int32)
+            return pd.Categorical.from_codes(codes, categories=categories)
+    categories = pd.Index(np.char.add("entity_", np.arange(n).astype(str)))
+    return pd.Categorical.from_codes(np.arange(n, dtype=np.int32), categories=categories)
+
+
 class Model:
     def __init__(self):
         self.model = None
         self.input_dim = 10 
+        self.layers = 3
+        self.units = 16
 
     def _build_model(self, input_dim):
         """
         Build a simple TF Autoencoder
+        Hidden widths halve towards the bottleneck and mirror back out,
+        e.g. layers=3, units=16 -> 16-8-16
         """
-        model = tf.keras.Sequential([
-            tf.keras.layers.Dense(16, activation='relu', input_shape=(input_dim,)),
-            tf.keras.layers.Dense(8, activation='relu'),
-            tf.keras.layers.Dense(16, activation='relu'),
+        encoder = [max(1, self.units >> i) for i in range((self.layers + 1) // 2)]
+        widths = encoder + encoder[:self.layers // 2][::-1]
+        hidden = [tf.keras.layers.Dense(widths[0], activation='relu', input_shape=(input_dim,))]
+        hidden += [tf.keras.layers.Dense(w, activation='relu') for w in widths[1:]]
+        model = tf.keras.Sequential(hidden + [
             tf.keras.layers.Dense(input_dim, activation='linear')
         ])
         model.compile(optimizer='adam', loss='mse')
@@ -35,6 +57,9 @@ class Model:
             X = ctx.df.select_dtypes(include=[np.number]).values.astype(np.float32)
             
         self.input_dim = X.shape[1]
+        params = getattr(ctx, 'hyperparameters', None) or {}
+        self.layers = params.get("layers", self.layers)
+        self.units = params.get("units", self.units)
         self.model = self._build_model(self.input_dim)
         
         history = self.model.fit(X, X, epochs=10, batch_size=32, verbose=0)
@@ -69,10 +94,7 @@ class Model:
                      padding = np.zeros((X.shape[0], self.input_dim - X.shape[1]), dtype=np.float32)
                      X = np.hstack((X, padding))
             
-            if "entity_id" in ctx.df.columns:
-                ids = ctx.df["entity_id"].values
-            else:
-                ids = [f"entity_{i}" for i in range(len(X))]
+            ids = _entity_ids(ctx.df, len(X))
                 
         if self.model is None:
              self.model = self._build_model(self.input_dim)
@@ -80,17 +102,15 @@ class Model:
         reconstructions = self.model.predict(X, verbose=0)
         mse = np.mean(np.power(X - reconstructions, 2), axis=1)
         
-        results = []
-        for i, score in enumerate(mse):
-            risk = min(100.0, float(score) * 50)
-            results.append({
-                "entity_id": str(ids[i]),
-                "risk_score": float(risk),
-                "anomaly_type": "tf_reconstruction_error" if risk > 50 else "normal",
-                "details": {"mse": float(score)}
-            })
-            
-        return pd.DataFrame(results)
+        mse = np.asarray(mse, dtype=np.float64)
+        risk = np.minimum(100.0, mse * 50)
+
+        return pd.DataFrame({
+            "entity_id": ids,
+            "risk_score": risk,
+            "anomaly_type": np.where(risk > 50, "tf_reconstruction_error", "normal"),
+            "details": [{"mse": score} for score in mse.tolist()]
+        })
 
     def execute(self, data=None):
          # shim for v1
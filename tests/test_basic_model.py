@@ -0,0 +1,127 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+basic_model streaming detector tests
+'''
+
+import importlib
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hub.registry import MODELS_DIR, load_model_module
+
+BASIC_MODEL_DIR = os.path.join(MODELS_DIR, "basic_model")
+
+
+@pytest.fixture(scope="module")
+def sketches():
+    load_model_module(BASIC_MODEL_DIR)
+    return importlib.import_module("basic_model.sketches")
+
+
+def test_keys_stable_across_int_and_float_chunks(sketches):
+    sketch = sketches.EntitySketch(top_k=10)
+    sketch.update_chunks([
+        pd.DataFrame({"user_id": [1001] * 60}),
+        # a missing id makes pandas parse the column as float64
+        pd.DataFrame({"user_id": [1001] * 60 + [None]}),
+        pd.DataFrame({"user_id": pd.Categorical([1001.0] * 30)}),
+        pd.DataFrame({"user_id": pd.Series(["1001"] * 10, dtype=object)}),
+    ])
+    assert [(key, count) for key, count, _ in sketch.top_k.top()] == [("1001", 160)]
+
+
+def test_factorize_keys_merges_equivalent_uniques(sketches):
+    codes, keys = sketches.factorize_keys(np.array([1, "1", 1.0, 2.5, None], dtype=object))
+    assert keys.tolist() == ["1", "2.5"]
+    assert codes.tolist() == [0, 0, 0, 1, -1]
+
+
+def test_low_rate_distinct_entity_flagged(sketches):
+    rng = np.random.default_rng(0)
+    users = np.repeat([f"u{i}" for i in range(2000)], 50)
+    hosts = rng.integers(0, 5, len(users)).astype(str)
+    df = pd.DataFrame({
+        "user_id": np.r_[users, ["scanner"] * 60],
+        "host": np.r_[hosts, [f"h{i}" for i in range(60)]],
+    }).sample(frac=1, random_state=1)
+
+    sketch = sketches.EntitySketch(distinct_column="host", top_k=20)
+    sketch.update_chunks(df.iloc[i:i + 5000] for i in range(0, len(df), 5000))
+    anomalies = sketch.anomalies(distinct_threshold=30)
+    assert [(a["entity_id"], a["anomaly_type"]) for a in anomalies] == [("scanner", "high_distinct_host")]
+
+
+def test_model_loads_helpers_standalone():
+    spec = importlib.util.spec_from_file_location("standalone_basic_model", os.path.join(BASIC_MODEL_DIR, "MODEL.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    df = pd.DataFrame({"user_id": ["a"] * 500 + [f"b{i}" for i in range(100)]})
+    anomalies = module._sketch_anomalies(df, {"volume_factor": 5.0, "min_events": 100})
+    assert [a["entity_id"] for a in anomalies] == ["a"]
+
+
+@pytest.fixture(scope="module")
+def windows():
+    load_model_module(BASIC_MODEL_DIR)
+    return importlib.import_module("basic_model.windows")
+
+
+def _poisson_events(rng, users=20, hours=24, rate=20):
+    frames = []
+    for user in range(users):
+        for hour in range(hours):
+            n = rng.poisson(rate)
+            offsets = pd.to_timedelta(hour * 3600 + rng.uniform(0, 3600, n), unit="s")
+            frames.append(pd.DataFrame({"user_id": f"u{user}", "timestamp": pd.Timestamp("2024-01-01") + offsets}))
+    return pd.concat(frames).sort_values("timestamp", ignore_index=True)
+
+
+def test_sliding_windows_skip_partial_warm_up(windows):
+    df = _poisson_events(np.random.default_rng(0))
+    engine = windows.WindowedVolume(window="2h", slide="30min")
+    anomalies = engine.update_chunks(df.iloc[i:i + 2000] for i in range(0, len(df), 2000))
+
+    assert anomalies == []
+    # full 2h windows starting every 30min inside 24h of data
+    assert engine.history.tolist() == [45] * 20
+
+
+def test_sliding_windows_flag_spike(windows):
+    rng = np.random.default_rng(0)
+    spike = pd.DataFrame({
+        "user_id": "u3",
+        "timestamp": pd.Timestamp("2024-01-01 15:10") + pd.to_timedelta(rng.uniform(0, 600, 200), unit="s"),
+    })
+    df = pd.concat([_poisson_events(rng), spike]).sort_values("timestamp", ignore_index=True)
+    engine = windows.WindowedVolume(window="2h", slide="30min")
+    anomalies = engine.update_chunks(df.iloc[i:i + 2000] for i in range(0, len(df), 2000))
+
+    assert {a["entity_id"] for a in anomalies} == {"u3"}
+    assert all(a["timestamp"] <= pd.Timestamp("2024-01-01 15:10", tz="UTC") for a in anomalies)
+
+
+def test_sub_second_slide_keys_do_not_overflow(windows):
+    times = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(600) * 0.1, unit="s")
+    engine = windows.WindowedVolume(window="1s", slide="500ms", min_history=1, min_events=1)
+    anomalies = engine.update_chunks([pd.DataFrame({"user_id": "a", "timestamp": times})])
+
+    assert anomalies == []
+    assert engine.events == 600
+    # 60s of data: window starts every 500ms, the last full one at 59.0s
+    assert engine.history.tolist() == [119]
+
+
+def test_window_entity_keys_stable_across_dtypes(windows):
+    start = pd.Timestamp("2024-01-01")
+    engine = windows.WindowedVolume(window="1h")
+    engine.update(pd.DataFrame({"user_id": [1001] * 5, "timestamp": start}))
+    engine.update(pd.DataFrame({"user_id": [1001.0] * 5 + [None], "timestamp": start + pd.Timedelta("1h")}))
+    engine.flush()
+
+    assert engine.entities.tolist() == ["1001"]
+    assert engine.history.tolist() == [2]
@@ -0,0 +1,68 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+model_networkx tests: personalized pagerank against networkx
+'''
+
+import os
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from hub.registry import MODELS_DIR, load_model_class
+from hub.context import ModelContext
+
+
+@pytest.fixture
+def model():
+    rng = np.random.default_rng(0)
+    edges = pd.DataFrame({
+        "source": [f"user_{i}" for i in rng.integers(0, 300, 2000)],
+        "target": [f"host_{i}" for i in rng.integers(0, 100, 2000)],
+    })
+    model = load_model_class(os.path.join(MODELS_DIR, "model_networkx"))()
+    model.train(ModelContext(edges))
+    return model
+
+
+def _reference(model, personalization, alpha=0.85):
+    graph = nx.relabel_nodes(model.graph, dict(enumerate(model.node_labels)))
+    return pd.Series(nx.pagerank(graph, alpha=alpha, personalization=personalization, tol=1e-10, max_iter=1000))
+
+
+@pytest.mark.parametrize("seeds", ["user_7", {"user_7": 1.0, "host_3": 3.0}])
+def test_personalized_pagerank_matches_networkx(model, seeds):
+    weights = seeds if isinstance(seeds, dict) else {seeds: 1.0}
+    expected = _reference(model, weights)
+
+    result = model.personalized_pagerank(seeds, tol=1e-9)
+    ppr = pd.Series([d["ppr"] for d in result["details"]], index=result["entity_id"].astype(str))
+
+    assert ppr.sum() == pytest.approx(1.0, abs=1e-4)
+    diff = ppr.reindex(expected.index, fill_value=0.0) - expected
+    assert diff.abs().max() < 1e-5
+
+
+def test_personalized_pagerank_default_tol_ranks_like_networkx(model):
+    expected = _reference(model, {"user_7": 1.0}).drop("user_7").nlargest(5)
+
+    result = model.personalized_pagerank("user_7", top_k=6)
+
+    assert result["entity_id"].iloc[0] == "user_7"
+    assert set(result["entity_id"].astype(str).iloc[1:]) == set(expected.index)
+
+
+def test_personalized_pagerank_unknown_seed(model):
+    with pytest.raises(ValueError, match="not in graph"):
+        model.personalized_pagerank("nobody")
+
+
+def test_mixed_type_ids_share_one_node():
+    edges = pd.DataFrame({"source": [1, "1", 2, 3], "target": [2, 3, "1", 4]}, dtype=object)
+    model = load_model_class(os.path.join(MODELS_DIR, "model_networkx"))()
+    model.train(ModelContext(edges))
+
+    assert sorted(model.node_labels) == ["1", "2", "3", "4"]
+    assert sorted(model.infer(ModelContext()).entity_id.astype(str)) == ["1", "2", "3", "4"]
+    assert model.personalized_pagerank(1)["entity_id"].iloc[0] == "1"
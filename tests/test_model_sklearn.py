@@ -0,0 +1,40 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+model_sklearn tests: entity ids in inference output
+'''
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hub.context import ModelContext
+from hub.registry import MODELS_DIR, load_model_class
+
+pytest.importorskip("sklearn")
+
+
+@pytest.fixture
+def features():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(rng.normal(size=(40, 3)), columns=["a", "b", "c"])
+
+
+@pytest.fixture
+def model(features):
+    model = load_model_class(os.path.join(MODELS_DIR, "model_sklearn"))()
+    model.train(ModelContext(features))
+    return model
+
+
+def test_synthetic_ids_without_id_column(model, features):
+    result = model.infer(ModelContext(features))
+    assert result["entity_id"].astype(str).tolist() == [f"entity_{i}" for i in range(40)]
+
+
+def test_id_column_is_categorical_and_deduplicated(model, features):
+    ids = pd.Series([1001, "1001"] * 20, dtype=object)
+    result = model.infer(ModelContext(features.assign(user_id=ids)))
+    assert isinstance(result["entity_id"].dtype, pd.CategoricalDtype)
+    assert result["entity_id"].cat.categories.tolist() == ["1001"]
@@ -0,0 +1,62 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+async runner tests: process-mode trained state publication
+'''
+
+import asyncio
+import os
+import tempfile
+
+import pandas as pd
+import pytest
+
+from hub.registry import MODELS_DIR
+from hub.runner import AsyncModel
+
+NETWORKX_DIR = os.path.join(MODELS_DIR, "model_networkx")
+
+EDGES = pd.DataFrame({
+    "source": ["alice", "alice", "bob", "carol"],
+    "target": ["bob", "carol", "dave", "dave"],
+})
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    # state pickles are created with tempfile in the parent process
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path
+
+
+def _state_files(state_dir):
+    return sorted(p.name for p in state_dir.glob("openuba-model-*"))
+
+
+def test_failed_process_train_keeps_published_state(state_dir):
+    async def run():
+        async with AsyncModel(NETWORKX_DIR, executor="process", max_concurrency=1) as model:
+            await model.train(EDGES)
+            with pytest.raises(Exception):
+                # a dict ctx.df selects one "source", here a scalar, so train fails midway
+                await model.train({"x": 5})
+            return await model.infer()
+
+    result = asyncio.run(run())
+    assert sorted(result["entity_id"].astype(str)) == ["alice", "bob", "carol", "dave"]
+    assert _state_files(state_dir) == []
+
+
+def test_process_state_files_outlive_queued_infers(state_dir):
+    async def run():
+        async with AsyncModel(NETWORKX_DIR, executor="process", max_concurrency=2) as model:
+            await model.train(EDGES)
+            calls = [model.train(EDGES) for _ in range(3)] + [model.infer() for _ in range(6)]
+            results = await asyncio.gather(*calls, return_exceptions=True)
+            # only the latest published state is left on disk
+            remaining = _state_files(state_dir)
+        return results, remaining
+
+    results, remaining = asyncio.run(run())
+    assert [r for r in results if isinstance(r, BaseException)] == []
+    assert len(remaining) == 1
+    assert _state_files(state_dir) == []
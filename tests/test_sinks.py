@@ -0,0 +1,123 @@
+'''
+Copyright 2019-Present The OpenUBA Platform Authors
+result sink tests; the elasticsearch sink runs against a local stub _bulk server
+'''
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from hub.sinks import ElasticsearchBulkSink, ParquetSink, ResultSink, drain
+
+
+class _BulkHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        lines = body.splitlines()
+        docs = [json.loads(line) for line in lines[1::2]]
+        self.server.requests.append((self.path, lines))
+        if self.server.fail_status:
+            self.send_response(self.server.fail_status)
+            self.end_headers()
+            return
+        items = [
+            {"index": {"status": 400 if doc.get("risk_score", 0) < 0 else 201}}
+            for doc in docs
+        ]
+        payload = json.dumps({"errors": any(i["index"]["status"] >= 300 for i in items), "items": items})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(payload.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def es_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BulkHandler)
+    server.requests = []
+    server.fail_status = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _results(n, start=0):
+    return pd.DataFrame({
+        "entity_id": pd.Categorical([f"user_{i}" for i in range(start, start + n)]),
+        "risk_score": [float(i) for i in range(n)],
+        "details": [{"rank": i} for i in range(n)],
+    })
+
+
+def _host(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_elasticsearch_sink_batches_and_ids(es_server):
+    sink = ElasticsearchBulkSink(_host(es_server), "anomalies", batch_size=4, concurrency=2, id_column="entity_id")
+    rows = drain([_results(5), _results(6, start=5)], sink)
+
+    assert rows == 11
+    assert sink.docs_sent == 11
+    assert sorted(len(lines) // 2 for _, lines in es_server.requests) == [3, 4, 4]
+    ids = sorted(json.loads(line)["index"]["_id"] for _, lines in es_server.requests for line in lines[0::2])
+    assert ids == sorted(f"user_{i}" for i in range(11))
+    assert all(path == "/_bulk" for path, _ in es_server.requests)
+
+
+def test_elasticsearch_sink_reports_failed_items(es_server):
+    df = _results(3)
+    df.loc[1, "risk_score"] = -1.0
+    sink = ElasticsearchBulkSink(_host(es_server), "anomalies", batch_size=10)
+    sink.write(df)
+    with pytest.raises(RuntimeError, match="1 bulk items failed"):
+        sink.close()
+    assert sink.docs_sent == 2
+
+
+def test_elasticsearch_sink_reports_failed_requests(es_server):
+    es_server.fail_status = 400
+    sink = ElasticsearchBulkSink(_host(es_server), "anomalies", batch_size=2, max_retries=0)
+    sink.write(_results(5))
+    with pytest.raises(RuntimeError, match="3 bulk requests failed"):
+        sink.close()
+    assert sink.docs_sent == 0
+
+
+def test_parquet_sink_mixed_categories(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "results.parquet")
+    # the second chunk has more categories than fit the first chunk's dictionary width
+    chunks = [_results(3), _results(300, start=3), _results(2, start=1000)]
+    rows = drain(chunks, ParquetSink(path, row_group_size=3))
+
+    table = pq.read_table(path).to_pandas()
+    assert rows == len(table) == 305
+    assert table["entity_id"].tolist()[:4] == ["user_0", "user_1", "user_2", "user_3"]
+    assert json.loads(table["details"].iloc[-1]) == {"rank": 1}
+
+
+class _FailingSink(ResultSink):
+    def write(self, df):
+        pass
+
+    def close(self):
+        raise RuntimeError("close failed")
+
+
+def test_drain_closes_every_sink(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "results.parquet")
+    parquet = ParquetSink(path, row_group_size=10)
+    with pytest.raises(RuntimeError, match="close failed"):
+        drain([_results(4)], _FailingSink(), parquet)
+    assert parquet.rows_written == 4
+    assert pd.read_parquet(path)["entity_id"].tolist() == ["user_0", "user_1", "user_2", "user_3"]